@@ -1187,14 +1187,14 @@ def do_send_messages(
             queue_json_publish("embed_links", event_data)
 
         if send_request.message.recipient.type == Recipient.PERSONAL:
-            welcome_bot_id = get_system_bot(settings.WELCOME_BOT, send_request.realm.id).id
+            welcome_bot = get_system_bot(settings.WELCOME_BOT, send_request.realm.id)
             if (
-                welcome_bot_id in send_request.active_user_ids
-                and welcome_bot_id != send_request.message.sender_id
+                welcome_bot.id in send_request.active_user_ids
+                and welcome_bot.id != send_request.message.sender_id
             ):
                 from zerver.lib.onboarding import send_welcome_bot_response
 
-                send_welcome_bot_response(send_request)
+                send_welcome_bot_response(send_request, welcome_bot)
 
         assert send_request.service_queue_events is not None
         for queue_name, events in send_request.service_queue_events.items():
@@ -1879,6 +1879,53 @@ def internal_prep_stream_message_by_name(
     )
 
 
+def internal_prep_stream_messages_by_name(
+    realm: Realm,
+    sender: UserProfile,
+    messages: Sequence[Tuple[str, str, str]],
+) -> List[Optional[SendMessageRequest]]:
+    """
+    Bulk version of internal_prep_stream_message_by_name, for a
+    sequence of (stream_name, topic_name, content) tuples.  Fetches
+    all of the streams in a single query, rather than once per
+    message.
+
+    The streams found that way get the same validation as
+    validate_stream_name_with_pm_notification does for the by-name
+    code path, including notifying a bot's owner that a stream has no
+    subscribers; we do it once per stream rather than once per message.
+    """
+    stream_names = {stream_name for stream_name, topic_name, content in messages}
+    streams_by_name: Dict[str, Stream] = {}
+    for stream in Stream.objects.filter(realm=realm, name__in=stream_names):
+        try:
+            check_stream_name(stream.name)
+        except JsonableError:
+            # Leave this to the by-name code path, which logs the error.
+            continue
+        # We already have the realm, so there's no need to join it in.
+        stream.realm = realm
+        send_pm_if_empty_stream(stream, realm, sender)
+        streams_by_name[stream.name] = stream
+
+    prepped_messages: List[Optional[SendMessageRequest]] = []
+    for stream_name, topic_name, content in messages:
+        stream = streams_by_name.get(stream_name)
+        if stream is None:
+            # Fall back to the case-insensitive lookup and error
+            # handling of the single-message code path.
+            prepped_messages.append(
+                internal_prep_stream_message_by_name(
+                    realm, sender, stream_name, topic_name, content
+                )
+            )
+        else:
+            prepped_messages.append(
+                internal_prep_stream_message(sender, stream, topic_name, content)
+            )
+    return prepped_messages
+
+
 def internal_prep_private_message(
     sender: UserProfile,
     recipient_user: UserProfile,
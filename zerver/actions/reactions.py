@@ -78,6 +78,9 @@ def do_add_reaction(
     """Should be called while holding a SELECT FOR UPDATE lock
     (e.g. via access_message(..., lock_message=True)) on the
     Message row, to prevent race conditions.
+
+    The lock is unnecessary if the message was created in the
+    current transaction, since no other transaction can see it yet.
     """
 
     reaction = Reaction(
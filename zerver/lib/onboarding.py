@@ -1,33 +1,51 @@
-from typing import Dict, List
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
 
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Count
+from django.db.models import Exists, OuterRef, Q
+from django.utils.translation import get_language
 from django.utils.translation import gettext as _
+from django.utils.translation import gettext_lazy
 from django.utils.translation import override as override_language
+from django_stubs_ext import StrPromise
 
 from zerver.actions.create_realm import setup_realm_internal_bots
 from zerver.actions.message_send import (
     do_send_messages,
-    internal_prep_stream_message_by_name,
+    internal_prep_stream_messages_by_name,
     internal_send_private_message,
 )
 from zerver.actions.reactions import do_add_reaction
-from zerver.lib.emoji import get_emoji_data
+from zerver.lib.emoji import EmojiData, name_to_codepoint
 from zerver.lib.message import SendMessageRequest, remove_single_newlines
-from zerver.models import Message, Realm, UserProfile
+from zerver.models import Reaction, Realm, UserProfile
 from zerver.models.users import get_system_bot
 
 
-def missing_any_realm_internal_bots() -> bool:
-    bot_emails = [
+def get_realm_internal_bot_emails() -> List[str]:
+    return [
         bot["email_template"] % (settings.INTERNAL_BOT_DOMAIN,)
         for bot in settings.REALM_INTERNAL_BOTS
     ]
-    realm_count = Realm.objects.count()
-    return UserProfile.objects.filter(email__in=bot_emails).values("email").annotate(
-        count=Count("id")
-    ).filter(count=realm_count).count() != len(bot_emails)
+
+
+def missing_any_realm_internal_bots(bot_emails: List[str]) -> bool:
+    if not bot_emails:
+        # Nothing to check, so skip the database entirely.
+        return False
+
+    # A single EXISTS query for any realm that lacks at least one of
+    # the internal bots; this is usually false, and avoids a GROUP BY
+    # over every bot in every realm.
+    realm_missing_any_bot = Q()
+    for email in bot_emails:
+        realm_missing_any_bot |= Q(
+            ~Exists(UserProfile.objects.filter(realm_id=OuterRef("id"), email=email))
+        )
+    return Realm.objects.filter(realm_missing_any_bot).exists()
 
 
 def create_if_missing_realm_internal_bots() -> None:
@@ -35,11 +53,67 @@ def create_if_missing_realm_internal_bots() -> None:
 
     If that is the case, it creates the missing realm internal bots.
     """
-    if missing_any_realm_internal_bots():
-        for realm in Realm.objects.all():
+    bot_emails = get_realm_internal_bot_emails()
+    if not missing_any_realm_internal_bots(bot_emails):
+        return
+
+    # Fetch every (realm_id, email) pair that already exists in a
+    # single query, and compare each realm's count against the number
+    # of internal bots, so that we only do the (fairly expensive) bot
+    # setup work for realms that are actually missing a bot.
+    existing_pairs = set(
+        UserProfile.objects.filter(email__in=bot_emails).values_list("realm_id", "email")
+    )
+    bot_count_by_realm_id = Counter(realm_id for realm_id, email in existing_pairs)
+    expected_bot_count = len(bot_emails)
+    realm_ids_missing_bots = [
+        realm_id
+        for realm_id in Realm.objects.values_list("id", flat=True)
+        if bot_count_by_realm_id[realm_id] < expected_bot_count
+    ]
+    # Creating a realm's bots is several bulk inserts; doing them all
+    # in one transaction avoids a commit per statement, and ensures we
+    # never leave a realm with only some of its bots set up.
+    with transaction.atomic():
+        for realm in Realm.objects.filter(id__in=realm_ids_missing_bots):
             setup_realm_internal_bots(realm)
 
 
+# The translated templates for the initial direct message depend only
+# on the language, so we look them up once per language; the
+# user-specific links are filled in by send_initial_direct_message.
+@lru_cache(maxsize=32)
+def get_initial_direct_message_templates(language: str) -> Dict[str, str]:
+    with override_language(language):
+        return {
+            "getting_started_class": _(
+                "If you are new to Zulip, check out our [Using Zulip for a class guide]({getting_started_url})!"
+            ),
+            "getting_started": _(
+                "If you are new to Zulip, check out our [Getting started guide]({getting_started_url})!"
+            ),
+            "organization_setup_class": " "
+            + _(
+                "We also have a guide for [Setting up Zulip for a class]({organization_setup_url})."
+            ),
+            "organization_setup": " "
+            + _(
+                "We also have a guide for [Setting up your organization]({organization_setup_url})."
+            ),
+            "demo_organization_warning": _(
+                "Note that this is a [demo organization]({demo_organization_help_url}) and will be "
+                "**automatically deleted** in 30 days."
+            )
+            + "\n\n",
+            "hello": _("Hello, and welcome to Zulip!"),
+            "introduction": _("This is a direct message from me, Welcome Bot."),
+            "reply_prompt": _(
+                "I can also help you get set up! Just click anywhere on this message or press `r` to reply."
+            ),
+            "commands_introduction": _("Here are a few messages I understand:"),
+        }
+
+
 def send_initial_direct_message(user: UserProfile) -> None:
     # We adjust the initial Welcome Bot direct message for education organizations.
     education_organization = user.realm.org_type in (
@@ -47,79 +121,53 @@ def send_initial_direct_message(user: UserProfile) -> None:
         Realm.ORG_TYPES["education"]["id"],
     )
 
-    # We need to override the language in this code path, because it's
-    # called from account registration, which is a pre-account API
-    # request and thus may not have the user's language context yet.
-    with override_language(user.default_language):
+    # We need to use the user's language explicitly in this code path,
+    # because it's called from account registration, which is a
+    # pre-account API request and thus may not have the user's
+    # language context yet.
+    templates = get_initial_direct_message_templates(user.default_language)
+
+    if education_organization:
+        getting_started_help = user.realm.url + "/help/using-zulip-for-a-class"
+        getting_started_string = templates["getting_started_class"].format(
+            getting_started_url=getting_started_help
+        )
+    else:
+        getting_started_help = user.realm.url + "/help/getting-started-with-zulip"
+        getting_started_string = templates["getting_started"].format(
+            getting_started_url=getting_started_help
+        )
+
+    organization_setup_string = ""
+    # Add extra content on setting up a new organization for administrators.
+    if user.is_realm_admin:
         if education_organization:
-            getting_started_help = user.realm.url + "/help/using-zulip-for-a-class"
-            getting_started_string = (
-                _(
-                    "If you are new to Zulip, check out our [Using Zulip for a class guide]({getting_started_url})!"
-                )
-            ).format(getting_started_url=getting_started_help)
+            organization_setup_help = user.realm.url + "/help/setting-up-zulip-for-a-class"
+            organization_setup_string = templates["organization_setup_class"].format(
+                organization_setup_url=organization_setup_help
+            )
         else:
-            getting_started_help = user.realm.url + "/help/getting-started-with-zulip"
-            getting_started_string = (
-                _(
-                    "If you are new to Zulip, check out our [Getting started guide]({getting_started_url})!"
-                )
-            ).format(getting_started_url=getting_started_help)
-
-        organization_setup_string = ""
-        # Add extra content on setting up a new organization for administrators.
-        if user.is_realm_admin:
-            if education_organization:
-                organization_setup_help = user.realm.url + "/help/setting-up-zulip-for-a-class"
-                organization_setup_string = (
-                    " "
-                    + _(
-                        "We also have a guide for [Setting up Zulip for a class]({organization_setup_url})."
-                    )
-                ).format(organization_setup_url=organization_setup_help)
-            else:
-                organization_setup_help = (
-                    user.realm.url + "/help/getting-your-organization-started-with-zulip"
-                )
-                organization_setup_string = (
-                    " "
-                    + _(
-                        "We also have a guide for [Setting up your organization]({organization_setup_url})."
-                    )
-                ).format(organization_setup_url=organization_setup_help)
-
-        demo_organization_warning_string = ""
-        # Add extra content about automatic deletion for demo organization owners.
-        if user.is_realm_owner and user.realm.demo_organization_scheduled_deletion_date is not None:
-            demo_organization_help = user.realm.url + "/help/demo-organizations"
-            demo_organization_warning_string = (
-                _(
-                    "Note that this is a [demo organization]({demo_organization_help_url}) and will be "
-                    "**automatically deleted** in 30 days."
-                )
-                + "\n\n"
-            ).format(demo_organization_help_url=demo_organization_help)
-
-        content = "".join(
-            [
-                _("Hello, and welcome to Zulip!") + "👋" + " ",
-                _("This is a direct message from me, Welcome Bot.") + "\n\n",
-                "{getting_started_text}",
-                "{organization_setup_text}\n\n",
-                "{demo_organization_text}",
-                _(
-                    "I can also help you get set up! Just click anywhere on this message or press `r` to reply."
-                )
-                + "\n\n",
-                _("Here are a few messages I understand:") + " ",
-                bot_commands(),
-            ]
+            organization_setup_help = (
+                user.realm.url + "/help/getting-your-organization-started-with-zulip"
+            )
+            organization_setup_string = templates["organization_setup"].format(
+                organization_setup_url=organization_setup_help
+            )
+
+    demo_organization_warning_string = ""
+    # Add extra content about automatic deletion for demo organization owners.
+    if user.is_realm_owner and user.realm.demo_organization_scheduled_deletion_date is not None:
+        demo_organization_help = user.realm.url + "/help/demo-organizations"
+        demo_organization_warning_string = templates["demo_organization_warning"].format(
+            demo_organization_help_url=demo_organization_help
         )
 
-    content = content.format(
-        getting_started_text=getting_started_string,
-        organization_setup_text=organization_setup_string,
-        demo_organization_text=demo_organization_warning_string,
+    content = (
+        f"{templates['hello']}👋 {templates['introduction']}\n\n"
+        f"{getting_started_string}{organization_setup_string}\n\n"
+        f"{demo_organization_warning_string}"
+        f"{templates['reply_prompt']}\n\n"
+        f"{templates['commands_introduction']} {bot_commands()}"
     )
 
     internal_send_private_message(
@@ -132,122 +180,173 @@ def send_initial_direct_message(user: UserProfile) -> None:
     )
 
 
-def bot_commands(no_help_command: bool = False) -> str:
-    commands = [
-        "apps",
-        "profile",
-        "theme",
-        "channels",
-        "topics",
-        "message formatting",
-        "keyboard shortcuts",
-    ]
-    if not no_help_command:
-        commands.append("help")
+def _format_bot_commands(commands: List[str]) -> str:
     return ", ".join("`" + command + "`" for command in commands) + "."
 
 
+# The command names are not translated, so these strings are the same
+# for every user; compute them once at import time.
+_BOT_COMMANDS = [
+    "apps",
+    "profile",
+    "theme",
+    "channels",
+    "topics",
+    "message formatting",
+    "keyboard shortcuts",
+]
+_BOT_COMMANDS_NO_HELP = _format_bot_commands(_BOT_COMMANDS)
+_BOT_COMMANDS_WITH_HELP = _format_bot_commands([*_BOT_COMMANDS, "help"])
+
+
+def bot_commands(no_help_command: bool = False) -> str:
+    if no_help_command:
+        return _BOT_COMMANDS_NO_HELP
+    return _BOT_COMMANDS_WITH_HELP
+
+
+def _apps_response() -> str:
+    return _(
+        "You can [download](/apps/) the [mobile and desktop apps](/apps/). "
+        "Zulip also works great in a browser."
+    )
+
+
+def _profile_response() -> str:
+    return _(
+        "Go to [Profile settings](#settings/profile) "
+        "to add a [profile picture](/help/change-your-profile-picture) "
+        "and edit your [profile information](/help/edit-your-profile)."
+    )
+
+
+def _theme_response() -> str:
+    return _(
+        "Go to [Preferences](#settings/preferences) "
+        "to [switch between the light and dark themes](/help/dark-theme), "
+        "[pick your favorite emoji theme](/help/emoji-and-emoticons#change-your-emoji-set), "
+        "[change your language](/help/change-your-language), "
+        "and make other tweaks to your Zulip experience."
+    )
+
+
+def _channels_response() -> str:
+    channels_help = _("In Zulip, channels [determine who gets a message]({help_link}).").format(
+        help_link="/help/introduction-to-channels"
+    )
+    browse_channels = _("[Browse and subscribe to channels]({settings_link}).").format(
+        settings_link="#channels/all"
+    )
+    return f"{channels_help}\n\n{browse_channels}"
+
+
+def _topics_response() -> str:
+    topics_help = _(
+        "In Zulip, topics [tell you what a message is about](/help/introduction-to-topics). "
+        "They are light-weight subjects, very similar to the subject line of an email."
+    )
+    recent_conversations = _(
+        "Check out [Recent conversations](#recent) to see what's happening! "
+        'You can return to this conversation by clicking "Direct messages" in the upper left.'
+    )
+    return f"{topics_help}\n\n{recent_conversations}"
+
+
+def _keyboard_shortcuts_response() -> str:
+    shortcuts_help = _(
+        "Zulip's [keyboard shortcuts](#keyboard-shortcuts) "
+        "let you navigate the app quickly and efficiently."
+    )
+    cheat_sheet = _("Press `?` any time to see a [cheat sheet](#keyboard-shortcuts).")
+    return f"{shortcuts_help}\n\n{cheat_sheet}"
+
+
+def _message_formatting_response() -> str:
+    formatting_help = _(
+        "Zulip uses [Markdown](/help/format-your-message-using-markdown), "
+        "an intuitive format for **bold**, *italics*, bulleted lists, and more. "
+        "Click [here](#message-formatting) for a cheat sheet."
+    )
+    messaging_tips = _(
+        "Check out our [messaging tips](/help/messaging-tips) "
+        "to learn about emoji reactions, code blocks and much more!"
+    )
+    return f"{formatting_help}\n\n{messaging_tips}"
+
+
+def _help_response() -> str:
+    commands_introduction = _("Here are a few messages I understand:")
+    learn_more = _(
+        "Check out our [Getting started guide](/help/getting-started-with-zulip), "
+        "or browse the [Help center](/help/) to learn more!"
+    )
+    return f"{commands_introduction} {bot_commands(no_help_command=True)}\n\n{learn_more}"
+
+
+def _unknown_command_response() -> str:
+    not_understood = _(
+        "I’m sorry, I did not understand your message. Please try one of the following commands:"
+    )
+    return f"{not_understood} {bot_commands()}"
+
+
+_WELCOME_BOT_RESPONSES: Dict[str, Callable[[], str]] = {
+    "apps": _apps_response,
+    "profile": _profile_response,
+    "theme": _theme_response,
+    "channels": _channels_response,
+    "topics": _topics_response,
+    "keyboard shortcuts": _keyboard_shortcuts_response,
+    "message formatting": _message_formatting_response,
+    "help": _help_response,
+}
+
+# Maps each message Welcome Bot understands to a key of
+# _WELCOME_BOT_RESPONSES.
+_WELCOME_BOT_COMMAND_ALIASES: Dict[str, str] = {
+    "app": "apps",
+    "apps": "apps",
+    "profile": "profile",
+    "theme": "theme",
+    "stream": "channels",
+    "streams": "channels",
+    "channel": "channels",
+    "channels": "channels",
+    "topic": "topics",
+    "topics": "topics",
+    "keyboard": "keyboard shortcuts",
+    "shortcuts": "keyboard shortcuts",
+    "keyboard shortcuts": "keyboard shortcuts",
+    "formatting": "message formatting",
+    "message formatting": "message formatting",
+    "help": "help",
+    "?": "help",
+}
+
+
 def select_welcome_bot_response(human_response_lower: str) -> str:
     # Given the raw (pre-markdown-rendering) content for a private
     # message from the user to Welcome Bot, select the appropriate reply.
-    if human_response_lower in ["app", "apps"]:
-        return _(
-            "You can [download](/apps/) the [mobile and desktop apps](/apps/). "
-            "Zulip also works great in a browser."
-        )
-    elif human_response_lower == "profile":
-        return _(
-            "Go to [Profile settings](#settings/profile) "
-            "to add a [profile picture](/help/change-your-profile-picture) "
-            "and edit your [profile information](/help/edit-your-profile)."
-        )
-    elif human_response_lower == "theme":
-        return _(
-            "Go to [Preferences](#settings/preferences) "
-            "to [switch between the light and dark themes](/help/dark-theme), "
-            "[pick your favorite emoji theme](/help/emoji-and-emoticons#change-your-emoji-set), "
-            "[change your language](/help/change-your-language), "
-            "and make other tweaks to your Zulip experience."
-        )
-    elif human_response_lower in ["stream", "streams", "channel", "channels"]:
-        return "".join(
-            [
-                _("In Zulip, channels [determine who gets a message]({help_link}).").format(
-                    help_link="/help/introduction-to-channels"
-                )
-                + "\n\n",
-                _("[Browse and subscribe to channels]({settings_link}).").format(
-                    settings_link="#channels/all"
-                ),
-            ]
-        )
-    elif human_response_lower in ["topic", "topics"]:
-        return "".join(
-            [
-                _(
-                    "In Zulip, topics [tell you what a message is about](/help/introduction-to-topics). "
-                    "They are light-weight subjects, very similar to the subject line of an email."
-                )
-                + "\n\n",
-                _(
-                    "Check out [Recent conversations](#recent) to see what's happening! "
-                    'You can return to this conversation by clicking "Direct messages" in the upper left.'
-                ),
-            ]
-        )
-    elif human_response_lower in ["keyboard", "shortcuts", "keyboard shortcuts"]:
-        return "".join(
-            [
-                _(
-                    "Zulip's [keyboard shortcuts](#keyboard-shortcuts) "
-                    "let you navigate the app quickly and efficiently."
-                )
-                + "\n\n",
-                _("Press `?` any time to see a [cheat sheet](#keyboard-shortcuts)."),
-            ]
-        )
-    elif human_response_lower in ["formatting", "message formatting"]:
-        return "".join(
-            [
-                _(
-                    "Zulip uses [Markdown](/help/format-your-message-using-markdown), "
-                    "an intuitive format for **bold**, *italics*, bulleted lists, and more. "
-                    "Click [here](#message-formatting) for a cheat sheet."
-                )
-                + "\n\n",
-                _(
-                    "Check out our [messaging tips](/help/messaging-tips) "
-                    "to learn about emoji reactions, code blocks and much more!"
-                ),
-            ]
-        )
-    elif human_response_lower in ["help", "?"]:
-        return "".join(
-            [
-                _("Here are a few messages I understand:") + " ",
-                bot_commands(no_help_command=True) + "\n\n",
-                _(
-                    "Check out our [Getting started guide](/help/getting-started-with-zulip), "
-                    "or browse the [Help center](/help/) to learn more!"
-                ),
-            ]
-        )
-    else:
-        return "".join(
-            [
-                _(
-                    "I’m sorry, I did not understand your message. Please try one of the following commands:"
-                )
-                + " ",
-                bot_commands(),
-            ]
-        )
+    command = _WELCOME_BOT_COMMAND_ALIASES.get(human_response_lower)
+    return _select_welcome_bot_response(get_language(), command)
+
 
+# The reply depends only on the active language and the command, so
+# we cache it.  Keying on the command rather than the raw message
+# keeps arbitrary user input out of the cache.
+@lru_cache(maxsize=256)
+def _select_welcome_bot_response(language: str, command: Optional[str]) -> str:
+    if command is None:
+        return _unknown_command_response()
+    return _WELCOME_BOT_RESPONSES[command]()
 
-def send_welcome_bot_response(send_request: SendMessageRequest) -> None:
+
+def send_welcome_bot_response(send_request: SendMessageRequest, welcome_bot: UserProfile) -> None:
     """Given the send_request object for a direct message from the user
-    to welcome-bot, trigger the welcome-bot reply."""
-    welcome_bot = get_system_bot(settings.WELCOME_BOT, send_request.realm.id)
+    to welcome-bot, trigger the welcome-bot reply.
+
+    The caller has already fetched welcome_bot to decide whether a
+    reply is needed, so we reuse it rather than looking it up again."""
     human_response_lower = send_request.message.content.lower()
     content = select_welcome_bot_response(human_response_lower)
 
@@ -261,17 +360,16 @@ def send_welcome_bot_response(send_request: SendMessageRequest) -> None:
     )
 
 
-@transaction.atomic
-def send_initial_realm_messages(realm: Realm) -> None:
-    # Sends the initial messages for a new organization.
-    #
-    # Technical note: Each stream created in the realm creation
-    # process should have at least one message declared in this
-    # function, to enforce the pseudo-invariant that every stream has
-    # at least one message.
-    welcome_bot = get_system_bot(settings.WELCOME_BOT, realm.id)
+# The initial realm messages depend only on the language, so we
+# translate and format them (including the regex work done by
+# remove_single_newlines) once per language, rather than once per
+# realm created.
+@lru_cache(maxsize=64)
+def get_initial_realm_message_contents(language: str) -> Dict[str, str]:
+    with override_language(language):
+        zulip_discussion_channel_name = str(Realm.ZULIP_DISCUSSION_CHANNEL_NAME)
+        welcome_to_zulip_topic_name = _("welcome to Zulip!")
 
-    with override_language(realm.default_language):
         # Content is declared here to apply translation properly.
         #
         # remove_single_newlines needs to be called on any multiline
@@ -308,8 +406,8 @@ the #**{zulip_discussion_channel_name}** channel, in the "{topic_name}" topic, a
 see in the left sidebar and above.
 """)
             ).format(
-                zulip_discussion_channel_name=str(Realm.ZULIP_DISCUSSION_CHANNEL_NAME),
-                topic_name=_("welcome to Zulip!"),
+                zulip_discussion_channel_name=zulip_discussion_channel_name,
+                topic_name=welcome_to_zulip_topic_name,
             )
         )
 
@@ -364,8 +462,8 @@ Link to a conversation: #**{zulip_discussion_channel_name}>{topic_name}**
 ```
 """)
         ).format(
-            zulip_discussion_channel_name=str(Realm.ZULIP_DISCUSSION_CHANNEL_NAME),
-            topic_name=_("welcome to Zulip!"),
+            zulip_discussion_channel_name=zulip_discussion_channel_name,
+            topic_name=welcome_to_zulip_topic_name,
         )
 
         content1_of_greetings_topic_name = _("""
@@ -393,112 +491,143 @@ they can be disabled. [Learn more]({zulip_update_announcements_help_url}).
             )
         )
 
-    welcome_messages: List[Dict[str, str]] = []
+        return {
+            "content1_of_moving_messages_topic_name": content1_of_moving_messages_topic_name,
+            "content2_of_moving_messages_topic_name": content2_of_moving_messages_topic_name,
+            "content1_of_welcome_to_zulip_topic_name": content1_of_welcome_to_zulip_topic_name,
+            "content2_of_welcome_to_zulip_topic_name": content2_of_welcome_to_zulip_topic_name,
+            "content3_of_welcome_to_zulip_topic_name": content3_of_welcome_to_zulip_topic_name,
+            "content4_of_welcome_to_zulip_topic_name": content4_of_welcome_to_zulip_topic_name,
+            "content1_of_start_conversation_topic_name": content1_of_start_conversation_topic_name,
+            "content2_of_start_conversation_topic_name": content2_of_start_conversation_topic_name,
+            "content3_of_start_conversation_topic_name": content3_of_start_conversation_topic_name,
+            "content1_of_experiments_topic_name": content1_of_experiments_topic_name,
+            "content2_of_experiments_topic_name": content2_of_experiments_topic_name,
+            "content1_of_greetings_topic_name": content1_of_greetings_topic_name,
+            "content2_of_greetings_topic_name": content2_of_greetings_topic_name,
+            "content_of_zulip_update_announcements_topic_name": content_of_zulip_update_announcements_topic_name,
+        }
 
-    # Messages added to the "welcome messages" list last will be most
-    # visible to users, since welcome messages will likely be browsed
-    # via the right sidebar or recent conversations view, both of
-    # which are sorted newest-first.
-    #
-    # Initial messages are configured below.
 
-    # Zulip updates system advertisement.
-    welcome_messages += [
-        {
-            "channel_name": str(Realm.DEFAULT_NOTIFICATION_STREAM_NAME),
-            "topic_name": str(Realm.ZULIP_UPDATE_ANNOUNCEMENTS_TOPIC_NAME),
-            "content": content_of_zulip_update_announcements_topic_name,
-        },
-    ]
+@dataclass
+class InitialRealmMessageTopic:
+    channel_name: StrPromise
+    topic_name: StrPromise
+    # Keys into get_initial_realm_message_contents, one per message.
+    content_keys: Tuple[str, ...]
 
-    # Advertising moving messages.
-    welcome_messages += [
-        {
-            "channel_name": str(Realm.ZULIP_DISCUSSION_CHANNEL_NAME),
-            "topic_name": _("moving messages"),
-            "content": content,
-        }
-        for content in [
-            content1_of_moving_messages_topic_name,
-            content2_of_moving_messages_topic_name,
-        ]
-    ]
 
+# The initial messages for a new organization.
+#
+# Messages listed last will be most visible to users, since welcome
+# messages will likely be browsed via the right sidebar or recent
+# conversations view, both of which are sorted newest-first.
+INITIAL_REALM_MESSAGES: Tuple[InitialRealmMessageTopic, ...] = (
+    # Zulip updates system advertisement.
+    InitialRealmMessageTopic(
+        channel_name=Realm.DEFAULT_NOTIFICATION_STREAM_NAME,
+        topic_name=Realm.ZULIP_UPDATE_ANNOUNCEMENTS_TOPIC_NAME,
+        content_keys=("content_of_zulip_update_announcements_topic_name",),
+    ),
+    # Advertising moving messages.
+    InitialRealmMessageTopic(
+        channel_name=Realm.ZULIP_DISCUSSION_CHANNEL_NAME,
+        topic_name=gettext_lazy("moving messages"),
+        content_keys=(
+            "content1_of_moving_messages_topic_name",
+            "content2_of_moving_messages_topic_name",
+        ),
+    ),
     # Suggestion to start your first new conversation.
-    welcome_messages += [
-        {
-            "channel_name": str(realm.ZULIP_SANDBOX_CHANNEL_NAME),
-            "topic_name": _("start a conversation"),
-            "content": content,
-        }
-        for content in [
-            content1_of_start_conversation_topic_name,
-            content2_of_start_conversation_topic_name,
-            content3_of_start_conversation_topic_name,
-        ]
-    ]
-
+    InitialRealmMessageTopic(
+        channel_name=Realm.ZULIP_SANDBOX_CHANNEL_NAME,
+        topic_name=gettext_lazy("start a conversation"),
+        content_keys=(
+            "content1_of_start_conversation_topic_name",
+            "content2_of_start_conversation_topic_name",
+            "content3_of_start_conversation_topic_name",
+        ),
+    ),
     # Suggestion to test messaging features.
     # Dependency on knowing how to send messages.
-    welcome_messages += [
-        {
-            "channel_name": str(realm.ZULIP_SANDBOX_CHANNEL_NAME),
-            "topic_name": _("experiments"),
-            "content": content,
-        }
-        for content in [content1_of_experiments_topic_name, content2_of_experiments_topic_name]
-    ]
-
+    InitialRealmMessageTopic(
+        channel_name=Realm.ZULIP_SANDBOX_CHANNEL_NAME,
+        topic_name=gettext_lazy("experiments"),
+        content_keys=(
+            "content1_of_experiments_topic_name",
+            "content2_of_experiments_topic_name",
+        ),
+    ),
     # Suggestion to send first message as a hi to your team.
-    welcome_messages += [
-        {
-            "channel_name": str(Realm.DEFAULT_NOTIFICATION_STREAM_NAME),
-            "topic_name": _("greetings"),
-            "content": content,
-        }
-        for content in [content1_of_greetings_topic_name, content2_of_greetings_topic_name]
-    ]
-
+    InitialRealmMessageTopic(
+        channel_name=Realm.DEFAULT_NOTIFICATION_STREAM_NAME,
+        topic_name=gettext_lazy("greetings"),
+        content_keys=(
+            "content1_of_greetings_topic_name",
+            "content2_of_greetings_topic_name",
+        ),
+    ),
     # Main welcome message, this should be last.
-    welcome_messages += [
-        {
-            "channel_name": str(realm.ZULIP_DISCUSSION_CHANNEL_NAME),
-            "topic_name": _("welcome to Zulip!"),
-            "content": content,
-        }
-        for content in [
-            content1_of_welcome_to_zulip_topic_name,
-            content2_of_welcome_to_zulip_topic_name,
-            content3_of_welcome_to_zulip_topic_name,
-            content4_of_welcome_to_zulip_topic_name,
-        ]
-    ]
+    InitialRealmMessageTopic(
+        channel_name=Realm.ZULIP_DISCUSSION_CHANNEL_NAME,
+        topic_name=gettext_lazy("welcome to Zulip!"),
+        content_keys=(
+            "content1_of_welcome_to_zulip_topic_name",
+            "content2_of_welcome_to_zulip_topic_name",
+            "content3_of_welcome_to_zulip_topic_name",
+            "content4_of_welcome_to_zulip_topic_name",
+        ),
+    ),
+)
 
-    # End of message declarations; now we actually send them.
+# Welcome Bot reacts to the first of the greetings messages.
+GREETINGS_MESSAGE_INDEX = [
+    content_key for topic in INITIAL_REALM_MESSAGES for content_key in topic.content_keys
+].index("content1_of_greetings_topic_name")
 
-    messages = [
-        internal_prep_stream_message_by_name(
-            realm,
-            welcome_bot,
-            message["channel_name"],
-            message["topic_name"],
-            message["content"],
-        )
-        for message in welcome_messages
-    ]
-    message_ids = [
-        sent_message_result.message_id for sent_message_result in do_send_messages(messages)
-    ]
+# A new organization can't have a custom emoji yet, so the reaction to
+# the greetings message is always the Unicode emoji; we don't need
+# get_emoji_data's per-realm custom emoji lookup.
+WAVE_EMOJI_DATA = EmojiData(
+    emoji_code=name_to_codepoint["wave"], reaction_type=Reaction.UNICODE_EMOJI
+)
 
-    # We find the one of our just-sent greetings messages, and react to it.
-    # This is a bit hacky, but works and is kinda a 1-off thing.
-    greetings_message = (
-        Message.objects.select_for_update()
-        .filter(id__in=message_ids, content__icontains='a great place to say "hi"')
-        .first()
-    )
-    assert greetings_message is not None
-    emoji_data = get_emoji_data(realm.id, "wave")
+
+@transaction.atomic
+def send_initial_realm_messages(realm: Realm) -> None:
+    # Sends the initial messages for a new organization.
+    #
+    # Technical note: Each stream created in the realm creation
+    # process should have at least one message declared in
+    # INITIAL_REALM_MESSAGES, to enforce the pseudo-invariant that
+    # every stream has at least one message.
+    welcome_bot = get_system_bot(settings.WELCOME_BOT, realm.id)
+
+    contents = get_initial_realm_message_contents(realm.default_language)
+
+    welcome_messages: List[Tuple[str, str, str]] = []
+    for topic in INITIAL_REALM_MESSAGES:
+        # Evaluate the lazy channel and topic names once per topic.
+        channel_name = str(topic.channel_name)
+        topic_name = str(topic.topic_name)
+        welcome_messages.extend(
+            (channel_name, topic_name, contents[content_key]) for content_key in topic.content_keys
+        )
+    messages = internal_prep_stream_messages_by_name(realm, welcome_bot, welcome_messages)
+    # Sending these in a single do_send_messages call inserts all of
+    # the Message and UserMessage rows with one bulk_create each.
+    do_send_messages(messages)
+
+    # We react to the first of our just-sent greetings messages.  We
+    # already have the Message object, saved by do_send_messages; and
+    # since it was created in this transaction, no other transaction
+    # can see it, so there's no need to lock it for do_add_reaction.
+    greetings_send_request = messages[GREETINGS_MESSAGE_INDEX]
+    assert greetings_send_request is not None
     do_add_reaction(
-        welcome_bot, greetings_message, "wave", emoji_data.emoji_code, emoji_data.reaction_type
+        welcome_bot,
+        greetings_send_request.message,
+        "wave",
+        WAVE_EMOJI_DATA.emoji_code,
+        WAVE_EMOJI_DATA.reaction_type,
     )
@@ -77,11 +77,10 @@ def has_user_group_access(
     if user_group.is_system_group:
         return False
 
-    group_member_ids = get_user_group_direct_member_ids(user_group)
     if (
         not user_profile.is_realm_admin
         and not user_profile.is_moderator
-        and user_profile.id not in group_member_ids
+        and not is_user_in_group(user_group, user_profile, direct_member_only=True)
     ):
         return False
 
@@ -408,10 +407,12 @@ def get_user_group_direct_members(user_group: UserGroup) -> QuerySet[UserProfile
     return user_group.direct_members.all()
 
 
-def get_direct_memberships_of_users(user_group: UserGroup, members: List[UserProfile]) -> List[int]:
+def get_direct_memberships_of_users(
+    user_group: UserGroup, member_ids: Collection[int]
+) -> List[int]:
     return list(
         UserGroupMembership.objects.filter(
-            user_group=user_group, user_profile__in=members
+            user_group=user_group, user_profile_id__in=member_ids
         ).values_list("user_profile_id", flat=True)
     )
 
@@ -467,7 +468,11 @@ def is_user_in_group(
     user_group: UserGroup, user: UserProfile, *, direct_member_only: bool = False
 ) -> bool:
     if direct_member_only:
-        return get_user_group_direct_members(user_group=user_group).filter(id=user.id).exists()
+        return (
+            get_user_group_direct_member_ids(user_group=user_group)
+            .filter(user_profile_id=user.id)
+            .exists()
+        )
 
     return get_recursive_group_members(user_group=user_group).filter(id=user.id).exists()
 
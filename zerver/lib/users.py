@@ -4,7 +4,19 @@ import unicodedata
 from collections import defaultdict
 from email.headerregistry import Address
 from operator import itemgetter
-from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, TypedDict
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypedDict,
+)
 
 import dateutil.parser as date_parser
 from django.conf import settings
@@ -231,21 +243,29 @@ def bulk_get_cross_realm_bots() -> Dict[str, UserProfile]:
     return {user.email.lower(): user for user in users}
 
 
-def user_ids_to_users(user_ids: Sequence[int], realm: Realm) -> List[UserProfile]:
+def user_ids_to_users_by_id(user_ids: Collection[int], realm: Realm) -> Dict[int, UserProfile]:
     # TODO: Consider adding a flag to control whether deactivated
     # users should be included.
+    user_profiles = UserProfile.objects.filter(id__in=user_ids, realm=realm).select_related("realm")
+    return {user_profile.id: user_profile for user_profile in user_profiles}
 
-    user_profiles = list(
-        UserProfile.objects.filter(id__in=user_ids, realm=realm).select_related("realm")
-    )
-
-    found_user_ids = {user_profile.id for user_profile in user_profiles}
 
+def preloaded_user_ids_to_users(
+    user_ids: Sequence[int], users_by_id: Dict[int, UserProfile]
+) -> List[UserProfile]:
+    """Like user_ids_to_users, but for callers that have already
+    fetched the users (with user_ids_to_users_by_id), possibly along
+    with others."""
     for user_id in user_ids:
-        if user_id not in found_user_ids:
+        if user_id not in users_by_id:
             raise JsonableError(_("Invalid user ID: {user_id}").format(user_id=user_id))
 
-    return user_profiles
+    user_id_set = set(user_ids)
+    return [user_profile for user_id, user_profile in users_by_id.items() if user_id in user_id_set]
+
+
+def user_ids_to_users(user_ids: Sequence[int], realm: Realm) -> List[UserProfile]:
+    return preloaded_user_ids_to_users(user_ids, user_ids_to_users_by_id(user_ids, realm))
 
 
 def access_bot_by_id(user_profile: UserProfile, user_id: int) -> UserProfile:
@@ -20,6 +20,7 @@ from zerver.actions.message_send import (
     extract_stream_indicator,
     internal_prep_private_message,
     internal_prep_stream_message_by_name,
+    internal_prep_stream_messages_by_name,
     internal_send_huddle_message,
     internal_send_private_message,
     internal_send_stream_message,
@@ -2623,6 +2624,70 @@ class InternalPrepTest(ZulipTestCase):
         # wasn't automatically created.
         Stream.objects.get(name=stream_name, realm_id=realm.id)
 
+    def test_internal_prep_stream_messages_by_name(self) -> None:
+        realm = get_realm("zulip")
+        sender = self.example_user("cordelia")
+        messages = [
+            ("Verona", "exact", "first"),
+            ("Denmark", "exact", "second"),
+            # Stream names are case-insensitive, but the batched lookup
+            # is an exact match; this takes the single-message path.
+            ("verona", "wrong case", "third"),
+            # So does a stream that doesn't exist yet, which gets created.
+            ("test_stream", "new stream", "fourth"),
+        ]
+
+        with mock.patch(
+            "zerver.actions.message_send.internal_prep_stream_message_by_name",
+            wraps=internal_prep_stream_message_by_name,
+        ) as m:
+            prepped_messages = internal_prep_stream_messages_by_name(realm, sender, messages)
+        self.assertEqual([call.args[2] for call in m.call_args_list], ["verona", "test_stream"])
+
+        verona = get_stream("Verona", realm)
+        expected_stream_ids = [
+            verona.id,
+            get_stream("Denmark", realm).id,
+            verona.id,
+            Stream.objects.get(name="test_stream", realm_id=realm.id).id,
+        ]
+        self.assert_length(prepped_messages, len(messages))
+        for prepped_message, (stream_name, topic_name, content), stream_id in zip(
+            prepped_messages, messages, expected_stream_ids
+        ):
+            assert prepped_message is not None
+            self.assertEqual(prepped_message.message.recipient.type_id, stream_id)
+            self.assertEqual(prepped_message.message.topic_name(), topic_name)
+            self.assertEqual(prepped_message.message.content, content)
+
+    def test_internal_prep_stream_messages_by_name_to_empty_stream(self) -> None:
+        realm = get_realm("zulip")
+        cordelia = self.example_user("cordelia")
+        bot = self.create_test_bot(
+            short_name="whatever",
+            user_profile=cordelia,
+        )
+        stream = create_stream_if_needed(realm, "Acropolis")[0]
+        old_count = message_stream_count(cordelia)
+
+        prepped_messages = internal_prep_stream_messages_by_name(
+            realm,
+            bot,
+            [(stream.name, "topic", "first"), (stream.name, "topic", "second")],
+        )
+
+        for prepped_message in prepped_messages:
+            assert prepped_message is not None
+            self.assertEqual(prepped_message.message.recipient.type_id, stream.id)
+        # Like the by-name code path, the owner is told that the stream
+        # has no subscribers; just once, for both messages.
+        self.assertEqual(message_stream_count(cordelia), old_count + 1)
+        self.assertEqual(
+            most_recent_message(cordelia).content,
+            "Your bot `whatever-bot@zulip.testserver` tried to send a message to "
+            "channel #**Acropolis**. The channel exists but does not have any subscribers.",
+        )
+
     def test_direct_message_to_self_and_bot_in_dm_disabled_org(self) -> None:
         """
         Test that a user can send a direct message to themselves and to a bot in a DM disabled organization
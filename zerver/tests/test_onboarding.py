@@ -1,14 +1,22 @@
-from zerver.lib.onboarding import create_if_missing_realm_internal_bots
+from unittest import mock
+
+from zerver.actions.create_realm import setup_realm_internal_bots
+from zerver.lib.onboarding import (
+    create_if_missing_realm_internal_bots,
+    get_realm_internal_bot_emails,
+    missing_any_realm_internal_bots,
+)
 from zerver.lib.test_classes import ZulipTestCase
 from zerver.models import Realm, UserProfile
+from zerver.models.realms import get_realm
 
 
 class TestRealmInternalBotCreation(ZulipTestCase):
-    def test_create_if_missing_realm_internal_bots(self) -> None:
-        realm_internal_bots_dict = [
-            {"var_name": "TEST_BOT", "email_template": "test-bot@%s", "name": "Test Bot"}
-        ]
+    realm_internal_bots_dict = [
+        {"var_name": "TEST_BOT", "email_template": "test-bot@%s", "name": "Test Bot"}
+    ]
 
+    def test_create_if_missing_realm_internal_bots(self) -> None:
         def check_test_bot_exists() -> bool:
             all_realms_count = Realm.objects.count()
             all_test_bot_count = UserProfile.objects.filter(
@@ -17,6 +25,47 @@ class TestRealmInternalBotCreation(ZulipTestCase):
             return all_realms_count == all_test_bot_count
 
         self.assertFalse(check_test_bot_exists())
-        with self.settings(REALM_INTERNAL_BOTS=realm_internal_bots_dict):
+        with self.settings(REALM_INTERNAL_BOTS=self.realm_internal_bots_dict):
             create_if_missing_realm_internal_bots()
         self.assertTrue(check_test_bot_exists())
+
+    def test_create_if_missing_realm_internal_bots_skips_complete_realms(self) -> None:
+        realm = get_realm("zulip")
+        with self.settings(REALM_INTERNAL_BOTS=self.realm_internal_bots_dict):
+            setup_realm_internal_bots(realm)
+
+            with mock.patch(
+                "zerver.lib.onboarding.setup_realm_internal_bots",
+                wraps=setup_realm_internal_bots,
+            ) as m:
+                create_if_missing_realm_internal_bots()
+            # Only the realms that were missing the bot are set up.
+            self.assertEqual(
+                {call.args[0].id for call in m.call_args_list},
+                set(Realm.objects.exclude(id=realm.id).values_list("id", flat=True)),
+            )
+
+            # Now that every realm has the bot, a second call just
+            # checks that and does nothing.
+            with mock.patch("zerver.lib.onboarding.setup_realm_internal_bots") as m:
+                with self.assert_database_query_count(1):
+                    create_if_missing_realm_internal_bots()
+            m.assert_not_called()
+
+    def test_missing_any_realm_internal_bots(self) -> None:
+        with self.settings(REALM_INTERNAL_BOTS=[]):
+            # With no internal bots configured, none can be missing.
+            with self.assert_database_query_count(0):
+                self.assertFalse(missing_any_realm_internal_bots(get_realm_internal_bot_emails()))
+
+        realm = get_realm("zulip")
+        with self.settings(REALM_INTERNAL_BOTS=self.realm_internal_bots_dict):
+            bot_emails = get_realm_internal_bot_emails()
+            self.assertTrue(missing_any_realm_internal_bots(bot_emails))
+
+            for other_realm in Realm.objects.exclude(id=realm.id):
+                setup_realm_internal_bots(other_realm)
+            self.assertTrue(missing_any_realm_internal_bots(bot_emails))
+
+            setup_realm_internal_bots(realm)
+            self.assertFalse(missing_any_realm_internal_bots(bot_emails))
@@ -1,7 +1,12 @@
+from unittest import mock
+
 from django.conf import settings
+from django.utils.translation import get_language
+from django.utils.translation import override as override_language
 from typing_extensions import override
 
 from zerver.actions.message_send import internal_send_private_message
+from zerver.lib.onboarding import _select_welcome_bot_response
 from zerver.lib.test_classes import ZulipTestCase
 from zerver.lib.test_helpers import message_stream_count, most_recent_message
 from zerver.models import UserProfile
@@ -173,6 +178,31 @@ class TutorialTests(ZulipTestCase):
             )
             self.assertEqual(most_recent_message(user).content, expected_response)
 
+    def test_response_to_pm_in_each_language(self) -> None:
+        user = self.example_user("hamlet")
+        bot = get_system_bot(settings.WELCOME_BOT, user.realm_id)
+        self.login_user(user)
+
+        # Replies are cached per language, so a reply already built in
+        # one language must not be reused for another.
+        def fake_gettext(message: str) -> str:
+            return f"[{get_language()}] {message}"
+
+        _select_welcome_bot_response.cache_clear()
+        self.addCleanup(_select_welcome_bot_response.cache_clear)
+        expected_response = (
+            "Go to [Profile settings](#settings/profile) "
+            "to add a [profile picture](/help/change-your-profile-picture) "
+            "and edit your [profile information](/help/edit-your-profile)."
+        )
+        with mock.patch("zerver.lib.onboarding._", side_effect=fake_gettext):
+            for language in ["en", "de", "en"]:
+                with override_language(language):
+                    self.send_personal_message(user, bot, "profile")
+                self.assertEqual(
+                    most_recent_message(user).content, f"[{language}] {expected_response}"
+                )
+
     def test_no_response_to_group_pm(self) -> None:
         user1 = self.example_user("hamlet")
         user2 = self.example_user("cordelia")
@@ -1,3 +1,4 @@
+import re
 from datetime import timedelta
 from typing import Iterable, Optional
 from unittest import mock
@@ -20,7 +21,7 @@ from zerver.lib.create_user import create_user
 from zerver.lib.mention import silent_mention_syntax_for_user
 from zerver.lib.streams import ensure_stream
 from zerver.lib.test_classes import ZulipTestCase
-from zerver.lib.test_helpers import most_recent_usermessage
+from zerver.lib.test_helpers import most_recent_usermessage, queries_captured
 from zerver.lib.user_groups import (
     AnonymousSettingGroupDict,
     get_direct_user_groups,
@@ -719,8 +720,24 @@ class UserGroupAPITestCase(UserGroupTestCase):
 
         params = {"can_mention_group": orjson.dumps(marketing_group.id).decode()}
         previous_can_mention_group_id = support_group.can_mention_group_id
-        result = self.client_patch(f"/json/user_groups/{support_group.id}", info=params)
+        with queries_captured() as queries:
+            result = self.client_patch(f"/json/user_groups/{support_group.id}", info=params)
         self.assert_json_success(result)
+
+        # The previous anonymous group's members and subgroups are read
+        # both to check whether the setting changed and for the audit
+        # log, but are only fetched once.
+        group_id = previous_can_mention_group_id
+        members_query = re.compile(
+            r'INNER JOIN "zerver_usergroupmembership" .*'
+            rf'"zerver_usergroupmembership"\."user_group_id" (= |IN \(){group_id}\b'
+        )
+        subgroups_query = re.compile(
+            r'INNER JOIN "zerver_groupgroupmembership" .*'
+            rf'"zerver_groupgroupmembership"\."supergroup_id" (= |IN \(){group_id}\b'
+        )
+        self.assert_length([query for query in queries if members_query.search(query.sql)], 1)
+        self.assert_length([query for query in queries if subgroups_query.search(query.sql)], 1)
         support_group = NamedUserGroup.objects.get(name="support", realm=hamlet.realm)
 
         # Test that the previous UserGroup object is deleted.
@@ -864,7 +881,7 @@ class UserGroupAPITestCase(UserGroupTestCase):
         params = dict(add=munge(new_user_ids))
 
         with mock.patch("zerver.views.user_groups.notify_for_user_group_subscription_changes"):
-            with self.assert_database_query_count(11):
+            with self.assert_database_query_count(12):
                 result = self.client_post(f"/json/user_groups/{user_group.id}/members", info=params)
         self.assert_json_success(result)
 
@@ -874,6 +891,30 @@ class UserGroupAPITestCase(UserGroupTestCase):
         self.assert_length(all_user_ids, 102)
         self.assert_user_membership(user_group, [hamlet, cordelia, *new_users, *original_users])
 
+        more_new_users = [
+            create_user(
+                email=f"more_new_user{i}@zulip.com",
+                password=None,
+                realm=realm,
+                full_name="full_name",
+            )
+            for i in range(50)
+        ]
+        params = dict(
+            add=munge([user.id for user in more_new_users]),
+            delete=munge([user.id for user in original_users]),
+        )
+
+        # Adding and removing members in one request costs only the
+        # removal's own 3 queries (its membership check, the DELETE,
+        # and its audit log entries) on top of an addition, since the
+        # user group is locked and the users are fetched just once.
+        with mock.patch("zerver.views.user_groups.notify_for_user_group_subscription_changes"):
+            with self.assert_database_query_count(15):
+                result = self.client_post(f"/json/user_groups/{user_group.id}/members", info=params)
+        self.assert_json_success(result)
+        self.assert_user_membership(user_group, [hamlet, cordelia, *new_users, *more_new_users])
+
     def test_update_members_of_user_group(self) -> None:
         hamlet = self.example_user("hamlet")
         self.login("hamlet")
@@ -912,6 +953,18 @@ class UserGroupAPITestCase(UserGroupTestCase):
         self.assert_json_error(result, f"User {othello.id} is already a member of this group")
         self.assert_user_membership(user_group, [hamlet, othello])
 
+        # Test adding a user that doesn't exist.
+        params = {"add": orjson.dumps([1111]).decode()}
+        result = self.client_post(f"/json/user_groups/{user_group.id}/members", info=params)
+        self.assert_json_error(result, "Invalid user ID: 1111")
+
+        # The existing memberships are checked before the user IDs are
+        # validated, so that is the error reported when both are wrong.
+        params = {"add": orjson.dumps([othello.id, 1111]).decode()}
+        result = self.client_post(f"/json/user_groups/{user_group.id}/members", info=params)
+        self.assert_json_error(result, f"User {othello.id} is already a member of this group")
+        self.assert_user_membership(user_group, [hamlet, othello])
+
         # Test user adding itself, bot and deactivated user to user group.
         desdemona = self.example_user("desdemona")
         self.login_user(desdemona)
@@ -961,6 +1014,16 @@ class UserGroupAPITestCase(UserGroupTestCase):
         # No notification message is sent for removing from user group.
         self.assertEqual(self.get_last_message(), initial_last_message)
 
+        # Test an invalid user ID among the removals when the additions
+        # are valid; the whole request fails.
+        params = {
+            "add": orjson.dumps([othello.id]).decode(),
+            "delete": orjson.dumps([1111]).decode(),
+        }
+        result = self.client_post(f"/json/user_groups/{user_group.id}/members", info=params)
+        self.assert_json_error(result, "Invalid user ID: 1111")
+        self.assert_user_membership(user_group, [hamlet])
+
         # Test when nothing is provided
         result = self.client_post(f"/json/user_groups/{user_group.id}/members", info={})
         msg = 'Nothing to do. Specify at least one of "add" or "delete".'
@@ -1,7 +1,8 @@
-from typing import Dict, List, Optional, Sequence, Union
+from typing import Callable, Dict, List, Optional, Sequence, Union
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.http import HttpRequest, HttpResponse
 from django.utils.translation import gettext as _
 from django.utils.translation import override as override_language
@@ -32,13 +33,17 @@ from zerver.lib.user_groups import (
     get_direct_memberships_of_users,
     get_group_setting_value_for_api,
     get_subgroup_ids,
-    get_user_group_direct_member_ids,
     get_user_group_member_ids,
     is_user_in_group,
     lock_subgroups_with_respect_to_supergroup,
     user_groups_in_realm_serialized,
 )
-from zerver.lib.users import access_user_by_id, user_ids_to_users
+from zerver.lib.users import (
+    access_user_by_id,
+    preloaded_user_ids_to_users,
+    user_ids_to_users,
+    user_ids_to_users_by_id,
+)
 from zerver.lib.validator import check_bool, check_dict_only, check_int, check_list, check_union
 from zerver.models import NamedUserGroup, UserGroup, UserProfile
 from zerver.models.users import get_system_bot
@@ -89,13 +94,16 @@ def add_user_group(
     name = check_user_group_name(name)
 
     group_settings_map = {}
-    request_settings_dict = locals()
+    # Each group permission setting accepted by this endpoint must be
+    # listed here, keyed by its name in GROUP_PERMISSION_SETTINGS.
+    request_settings_dict = {"can_mention_group": can_mention_group}
     for setting_name, permission_config in NamedUserGroup.GROUP_PERMISSION_SETTINGS.items():
         if setting_name not in request_settings_dict:  # nocoverage
             continue
 
-        if request_settings_dict[setting_name] is not None:
-            setting_value = parse_group_setting_value(request_settings_dict[setting_name])
+        request_setting_value = request_settings_dict[setting_name]
+        if request_setting_value is not None:
+            setting_value = parse_group_setting_value(request_setting_value)
             setting_value_group = access_user_group_for_setting(
                 setting_value,
                 user_profile,
@@ -132,11 +140,14 @@ def are_both_setting_values_equal(
     if isinstance(first_setting_value, AnonymousSettingGroupDict) and isinstance(
         second_setting_value, AnonymousSettingGroupDict
     ):
-        return set(first_setting_value.direct_members) == set(
-            second_setting_value.direct_members
-        ) and set(first_setting_value.direct_subgroups) == set(
+        # We compare the subgroups first, since there are usually far
+        # fewer of them, so that we only build the (potentially large)
+        # sets of members when the subgroups match.  Note that the
+        # lists can't be compared by length first, since the values
+        # from the request may contain duplicates.
+        return set(first_setting_value.direct_subgroups) == set(
             second_setting_value.direct_subgroups
-        )
+        ) and set(first_setting_value.direct_members) == set(second_setting_value.direct_members)
 
     return False
 
@@ -175,16 +186,30 @@ def edit_user_group(
     if description is not None and description != user_group.description:
         do_update_user_group_description(user_group, description, acting_user=user_profile)
 
-    request_settings_dict = locals()
+    # Each group permission setting accepted by this endpoint must be
+    # listed here, keyed by its name in GROUP_PERMISSION_SETTINGS.
+    request_settings_dict = {"can_mention_group": can_mention_group}
     for setting_name, permission_config in NamedUserGroup.GROUP_PERMISSION_SETTINGS.items():
         if setting_name not in request_settings_dict:  # nocoverage
             continue
 
-        if request_settings_dict[setting_name] is None:
+        request_setting_value = request_settings_dict[setting_name]
+        if request_setting_value is None:
             continue
 
         current_value = getattr(user_group, setting_name)
-        new_setting_value = parse_group_setting_value(request_settings_dict[setting_name])
+        if not hasattr(current_value, "named_user_group"):
+            # The members of an anonymous group are read both here and
+            # again when logging the change.  If the setting switches to
+            # a named group, the second read uses this prefetch; if it
+            # stays anonymous, the group's memberships are updated in
+            # place, which clears the prefetched values and re-fetches.
+            prefetch_related_objects(
+                [current_value],
+                Prefetch("direct_members", queryset=UserProfile.objects.only("id")),
+                Prefetch("direct_subgroups", queryset=NamedUserGroup.objects.only("id")),
+            )
+        new_setting_value = parse_group_setting_value(request_setting_value)
         if check_setting_value_changed(current_value, new_setting_value):
             setting_value_group = access_user_group_for_setting(
                 new_setting_value,
@@ -215,6 +240,7 @@ def delete_user_group(
     return json_success(request)
 
 
+@transaction.atomic
 @require_user_group_edit_permission
 @has_request_variables
 def update_user_group_backend(
@@ -227,12 +253,43 @@ def update_user_group_backend(
     if not add and not delete:
         raise JsonableError(_('Nothing to do. Specify at least one of "add" or "delete".'))
 
+    # We fetch and lock the user group once, for both the additions
+    # and the removals.
+    user_group = access_user_group_by_id(user_group_id, user_profile, for_read=False)
+    # Both thunks send their notifications from the same bot, so they
+    # can share it and its MentionBackend.
+    notification_bot = get_system_bot(settings.NOTIFICATION_BOT, user_profile.realm_id)
+    mention_backend = MentionBackend(user_profile.realm_id)
+    # Similarly, we fetch the users being added and removed in a
+    # single query.  We do so lazily, once a thunk needs them, so that
+    # a request that fails the membership checks for additions doesn't
+    # load them at all.
+    users_by_id: Optional[Dict[int, UserProfile]] = None
+
+    def member_ids_to_users(member_ids: Sequence[int]) -> List[UserProfile]:
+        nonlocal users_by_id
+        if users_by_id is None:
+            users_by_id = user_ids_to_users_by_id({*add, *delete}, user_profile.realm)
+        return preloaded_user_ids_to_users(member_ids, users_by_id)
+
     thunks = [
         lambda: add_members_to_group_backend(
-            request, user_profile, user_group_id=user_group_id, members=add
+            request,
+            user_profile,
+            user_group=user_group,
+            members=add,
+            member_ids_to_users=member_ids_to_users,
+            notification_bot=notification_bot,
+            mention_backend=mention_backend,
         ),
         lambda: remove_members_from_group_backend(
-            request, user_profile, user_group_id=user_group_id, members=delete
+            request,
+            user_profile,
+            user_group=user_group,
+            members=delete,
+            member_ids_to_users=member_ids_to_users,
+            notification_bot=notification_bot,
+            mention_backend=mention_backend,
         ),
     ]
     data = compose_views(thunks)
@@ -245,14 +302,18 @@ def notify_for_user_group_subscription_changes(
     recipient_users: List[UserProfile],
     user_group: NamedUserGroup,
     *,
+    notification_bot: UserProfile,
+    mention_backend: MentionBackend,
     send_subscription_message: bool = False,
     send_unsubscription_message: bool = False,
 ) -> None:
-    realm = acting_user.realm
-    mention_backend = MentionBackend(realm.id)
-
     notifications = []
-    notification_bot = get_system_bot(settings.NOTIFICATION_BOT, realm.id)
+    # These don't depend on the recipient, so we compute them once.
+    acting_user_mention = silent_mention_syntax_for_user(acting_user)
+    group_mention = f"@_*{user_group.name}*"
+    # The notification content depends only on the recipient's
+    # language, so we translate it once per language.
+    message_by_language: Dict[str, str] = {}
     for recipient_user in recipient_users:
         if recipient_user.id == acting_user.id:
             # Don't send notification message if you subscribed/unsubscribed yourself.
@@ -264,17 +325,21 @@ def notify_for_user_group_subscription_changes(
             # Don't send notification message to deactivated users.
             continue
 
-        with override_language(recipient_user.default_language):
-            if send_subscription_message:
-                message = _("{user_full_name} added you to the group {group_name}.").format(
-                    user_full_name=silent_mention_syntax_for_user(acting_user),
-                    group_name=f"@_*{user_group.name}*",
-                )
-            if send_unsubscription_message:
-                message = _("{user_full_name} removed you from the group {group_name}.").format(
-                    user_full_name=silent_mention_syntax_for_user(acting_user),
-                    group_name=f"@_*{user_group.name}*",
-                )
+        language = recipient_user.default_language
+        if language not in message_by_language:
+            with override_language(language):
+                if send_subscription_message:
+                    message = _("{user_full_name} added you to the group {group_name}.").format(
+                        user_full_name=acting_user_mention,
+                        group_name=group_mention,
+                    )
+                if send_unsubscription_message:
+                    message = _("{user_full_name} removed you from the group {group_name}.").format(
+                        user_full_name=acting_user_mention,
+                        group_name=group_mention,
+                    )
+            message_by_language[language] = message
+        message = message_by_language[language]
 
         notifications.append(
             internal_prep_private_message(
@@ -289,48 +354,63 @@ def notify_for_user_group_subscription_changes(
         do_send_messages(notifications)
 
 
-@transaction.atomic
+@transaction.atomic(savepoint=False)
 def add_members_to_group_backend(
-    request: HttpRequest, user_profile: UserProfile, user_group_id: int, members: Sequence[int]
+    request: HttpRequest,
+    user_profile: UserProfile,
+    user_group: NamedUserGroup,
+    members: Sequence[int],
+    *,
+    member_ids_to_users: Callable[[Sequence[int]], List[UserProfile]],
+    notification_bot: UserProfile,
+    mention_backend: MentionBackend,
 ) -> HttpResponse:
     if not members:
         return json_success(request)
 
-    user_group = access_user_group_by_id(user_group_id, user_profile, for_read=False)
-    member_users = user_ids_to_users(members, user_profile.realm)
-    existing_member_ids = set(
-        get_direct_memberships_of_users(user_group.usergroup_ptr, member_users)
-    )
-
-    for member_user in member_users:
-        if member_user.id in existing_member_ids:
-            raise JsonableError(
-                _("User {user_id} is already a member of this group").format(
-                    user_id=member_user.id,
-                )
+    # Every ID returned here is one of the requested members, so any
+    # result at all is an error; we check this before fetching the
+    # UserProfile objects, which we only need for a successful request.
+    existing_member_ids = set(get_direct_memberships_of_users(user_group.usergroup_ptr, members))
+    if existing_member_ids:
+        raise JsonableError(
+            _("User {user_id} is already a member of this group").format(
+                user_id=next(member for member in members if member in existing_member_ids),
             )
+        )
 
+    member_users = member_ids_to_users(members)
     member_user_ids = [member_user.id for member_user in member_users]
     bulk_add_members_to_user_groups([user_group], member_user_ids, acting_user=user_profile)
     notify_for_user_group_subscription_changes(
         acting_user=user_profile,
         recipient_users=member_users,
         user_group=user_group,
+        notification_bot=notification_bot,
+        mention_backend=mention_backend,
         send_subscription_message=True,
     )
     return json_success(request)
 
 
-@transaction.atomic
+@transaction.atomic(savepoint=False)
 def remove_members_from_group_backend(
-    request: HttpRequest, user_profile: UserProfile, user_group_id: int, members: Sequence[int]
+    request: HttpRequest,
+    user_profile: UserProfile,
+    user_group: NamedUserGroup,
+    members: Sequence[int],
+    *,
+    member_ids_to_users: Callable[[Sequence[int]], List[UserProfile]],
+    notification_bot: UserProfile,
+    mention_backend: MentionBackend,
 ) -> HttpResponse:
     if not members:
         return json_success(request)
 
-    user_profiles = user_ids_to_users(members, user_profile.realm)
-    user_group = access_user_group_by_id(user_group_id, user_profile, for_read=False)
-    group_member_ids = get_user_group_direct_member_ids(user_group)
+    user_profiles = member_ids_to_users(members)
+    # We only need to know which of the requested users are members,
+    # not every member of the group.
+    group_member_ids = set(get_direct_memberships_of_users(user_group.usergroup_ptr, members))
     for member in members:
         if member not in group_member_ids:
             raise JsonableError(
@@ -343,6 +423,8 @@ def remove_members_from_group_backend(
         acting_user=user_profile,
         recipient_users=user_profiles,
         user_group=user_group,
+        notification_bot=notification_bot,
+        mention_backend=mention_backend,
         send_unsubscription_message=True,
     )
     return json_success(request)
@@ -357,8 +439,8 @@ def add_subgroups_to_group_backend(
     with lock_subgroups_with_respect_to_supergroup(
         subgroup_ids, user_group_id, user_profile
     ) as context:
-        existing_direct_subgroup_ids = context.supergroup.direct_subgroups.all().values_list(
-            "id", flat=True
+        existing_direct_subgroup_ids = set(
+            context.supergroup.direct_subgroups.all().values_list("id", flat=True)
         )
         for group in context.direct_subgroups:
             if group.id in existing_direct_subgroup_ids:
@@ -368,10 +450,13 @@ def add_subgroups_to_group_backend(
                     )
                 )
 
-        recursive_subgroup_ids = {
-            recursive_subgroup.id for recursive_subgroup in context.recursive_subgroups
-        }
-        if user_group_id in recursive_subgroup_ids:
+        # The recursive subgroups have already been fetched (and
+        # locked), so we check them in memory, stopping at the first
+        # match, rather than querying the database again.
+        if any(
+            recursive_subgroup.id == user_group_id
+            for recursive_subgroup in context.recursive_subgroups
+        ):
             raise JsonableError(
                 _(
                     "User group {user_group_id} is already a subgroup of one of the passed subgroups."
@@ -396,8 +481,8 @@ def remove_subgroups_from_group_backend(
         # While the recursive subgroups in the context are not used, it is important that
         # we acquire a lock for these rows while updating the subgroups to acquire the locks
         # in a consistent order for subgroup membership changes.
-        existing_direct_subgroup_ids = context.supergroup.direct_subgroups.all().values_list(
-            "id", flat=True
+        existing_direct_subgroup_ids = set(
+            context.supergroup.direct_subgroups.all().values_list("id", flat=True)
         )
         for group in context.direct_subgroups:
             if group.id not in existing_direct_subgroup_ids: